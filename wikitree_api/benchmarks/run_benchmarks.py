@@ -0,0 +1,150 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from include.family_tree_dag import FamilyTreeDAG, get_ancestors, lowest_common_ancestor, find_lca_bidirectional
+from include.csr_family_tree import CSRFamilyTree
+from include.pedigree_loader import load_family_tree
+from include.tree_renderer import ancestor_subgraph, to_dot, render_dot
+from benchmarks.synthetic_pedigree import generate_pedigree, ancestors_of, write_dump
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+
+def time_stage(function, repeat):
+    # Best of repeat runs; the functions print, so their output is dropped.
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_size(size, args):
+    profiles, probands = generate_pedigree(size, depth=args.depth, branching=args.branching,
+                                           collapse=args.collapse, seed=args.seed)
+    profiles_by_id = {profile['Id']: profile for profile in profiles}
+    ids_by_name = {profile['Name']: profile['Id'] for profile in profiles}
+    individual1, individual2 = probands[0], probands[-1]
+    ancestors1 = ancestors_of(profiles_by_id, ids_by_name[individual1])
+    ancestors2 = ancestors_of(profiles_by_id, ids_by_name[individual2])
+
+    timings = {}
+    timings['build_graph'], dag = time_stage(
+        lambda: FamilyTreeDAG(ancestors1, ancestors2, individual1, individual2), args.repeat)
+    timings['build_csr'], _ = time_stage(lambda: CSRFamilyTree.from_profiles(profiles), args.repeat)
+    timings['get_ancestors'], _ = time_stage(lambda: get_ancestors(individual1, dag), args.repeat)
+    timings['lowest_common_ancestor'], lca = time_stage(
+        lambda: lowest_common_ancestor(individual1, individual2, dag), args.repeat)
+    csr = CSRFamilyTree.from_profiles(profiles)
+    timings['find_lca_bidirectional'], _ = time_stage(
+        lambda: find_lca_bidirectional(individual1, individual2, csr), args.repeat)
+    timings['find_root'], root = time_stage(lambda: dag.find_root(individual1), args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump = os.path.join(directory, 'pedigree.json')
+        write_dump(dump, [(individual1, ancestors1), (individual2, ancestors2)])
+        timings['load_dump'], _ = time_stage(lambda: load_family_tree(dump), args.repeat)
+
+    # Rendering goes through the same DOT path as main.py. Building the DOT
+    # source is always timed; laying it out needs Graphviz's dot program.
+    timings['to_dot'], source = time_stage(
+        lambda: to_dot(*ancestor_subgraph(dag, individual1), individual1), args.repeat)
+    render = None
+    if shutil.which('dot') is None:
+        render = "skipped: Graphviz 'dot' program not found"
+    elif dag.graph.number_of_nodes() > args.render_max_nodes:
+        render = f"skipped: more than {args.render_max_nodes} nodes"
+    else:
+        filename = os.path.join(tempfile.gettempdir(), 'benchmark_tree.svg')
+        timings['render'], _ = time_stage(lambda: render_dot(source, filename), 1)
+
+    return {
+        'profiles': size,
+        'ancestors': [len(ancestors1), len(ancestors2)],
+        'nodes': dag.graph.number_of_nodes(),
+        'edges': dag.graph.number_of_edges(),
+        'lca': lca,
+        'render': render,
+        'seconds': timings,
+    }
+
+
+def fit_scaling(results):
+    # Least-squares fit of log(seconds) = exponent * log(profiles) + c, i.e.
+    # seconds ~ coefficient * profiles ** exponent.
+    fits = {}
+    stages = sorted({stage for result in results for stage in result['seconds']})
+    for stage in stages:
+        points = [(math.log(result['profiles']), math.log(result['seconds'][stage]))
+                  for result in results if result['seconds'].get(stage, 0) > 0]
+        if len(points) < 2:
+            continue
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        spread = sum((x - mean_x) ** 2 for x, _ in points)
+        if not spread:
+            continue
+        exponent = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+        fits[stage] = {
+            'exponent': exponent,
+            'coefficient': math.exp(mean_y - exponent * mean_x),
+            'points': len(points),
+        }
+    return fits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LCA pipeline on synthetic pedigrees")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Number of profiles per run")
+    parser.add_argument("--depth", type=int, help="Generations above the probands (default: enough to cover every size)")
+    parser.add_argument("--branching", type=float, default=1.5, help="Mean number of children per couple")
+    parser.add_argument("--collapse", type=float, default=0.1, help="Share of parents drawn from a small core of each generation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest one is reported")
+    parser.add_argument("--render-max-nodes", type=int, default=20000, help="Skip rendering for larger graphs")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = run_size(size, args)
+        results.append(result)
+        stages = ", ".join(f"{stage} {seconds:.4f}s" for stage, seconds in result['seconds'].items())
+        print(f"{size} profiles ({result['nodes']} nodes): {stages}")
+
+    fits = fit_scaling(results)
+    for stage, fit in fits.items():
+        print(f"{stage}: ~ n^{fit['exponent']:.2f}")
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': {
+            'depth': args.depth,
+            'branching': args.branching,
+            'collapse': args.collapse,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': results,
+        'scaling': fits,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
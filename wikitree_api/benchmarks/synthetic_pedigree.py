@@ -0,0 +1,104 @@
+import json
+import math
+import random
+
+
+def generate_pedigree(num_profiles, depth=None, branching=1.5, collapse=0.0, seed=0):
+    # Builds a population of num_profiles profiles split into depth + 1
+    # generations. Generation 0 holds the probands; going up, each generation
+    # is 2 / branching times larger (branching is the mean number of
+    # children per couple). Parents are drawn from the generation above, and
+    # with probability collapse from a small core of it, which makes many
+    # lines run into the same ancestors (pedigree collapse).
+    # Returns (profiles, probands) with profiles in getAncestors format.
+    if branching <= 0:
+        raise ValueError("branching must be positive")
+    rng = random.Random(seed)
+    growth = 2.0 / branching
+    if depth is None:
+        # With branching above 2 the generations shrink going up and the
+        # sum converges, so stop once the top generation would fall below
+        # two profiles.
+        depth = 1
+        while (2 * _geometric_sum(growth, depth) < num_profiles
+               and num_profiles * growth ** (depth + 1) / _geometric_sum(growth, depth + 1) >= 2):
+            depth += 1
+    weight = _geometric_sum(growth, depth)
+    sizes = [max(2, round(num_profiles * growth ** generation / weight)) for generation in range(depth + 1)]
+
+    generations = []
+    next_id = 1
+    for size in sizes:
+        generations.append(list(range(next_id, next_id + size)))
+        next_id += size
+
+    profiles = []
+    for generation, ids in enumerate(generations):
+        if generation < depth:
+            above = generations[generation + 1]
+            fathers, mothers = above[0::2], above[1::2]
+            core_fathers = fathers[:max(1, math.ceil(len(fathers) * 0.05))]
+            core_mothers = mothers[:max(1, math.ceil(len(mothers) * 0.05))]
+        for index, profile_id in enumerate(ids):
+            father = mother = 0
+            if generation < depth:
+                father = _pick_parent(rng, fathers, core_fathers, collapse)
+                mother = _pick_parent(rng, mothers, core_mothers, collapse)
+            gender = "Male" if index % 2 == 0 else "Female"
+            profiles.append(_profile(profile_id, generation, gender, father, mother))
+    return profiles, [f"Synth-{profile_id}" for profile_id in generations[0]]
+
+
+def _geometric_sum(ratio, depth):
+    return sum(ratio ** generation for generation in range(depth + 1))
+
+
+def _pick_parent(rng, candidates, core, collapse):
+    if collapse and rng.random() < collapse:
+        return rng.choice(core)
+    return rng.choice(candidates)
+
+
+def _profile(profile_id, generation, gender, father, mother):
+    return {
+        "Id": profile_id,
+        "Name": f"Synth-{profile_id}",
+        "FirstName": f"Person{profile_id}",
+        "LastNameAtBirth": "Synth",
+        "Gender": gender,
+        "BirthDate": f"{2000 - 30 * generation}-00-00",
+        "IsLiving": 0,
+        "Privacy": 60,
+        "DataStatus": {"BirthDate": "guess", "Father": "", "Mother": ""},
+        "Privacy_IsOpen": True,
+        "Father": father,
+        "Mother": mother,
+    }
+
+
+def ancestors_of(profiles_by_id, proband_id, depth=None):
+    # Same order getAncestors uses: the proband first, then breadth first.
+    ancestors = []
+    seen = {proband_id}
+    frontier = [proband_id]
+    generation = 0
+    while frontier and (depth is None or generation <= depth):
+        next_frontier = []
+        for profile_id in frontier:
+            profile = profiles_by_id[profile_id]
+            ancestors.append(profile)
+            for parent_id in (profile["Father"], profile["Mother"]):
+                if parent_id and parent_id not in seen:
+                    seen.add(parent_id)
+                    next_frontier.append(parent_id)
+        frontier = next_frontier
+        generation += 1
+    return ancestors
+
+
+def write_dump(path, responses):
+    # One getAncestors response per line, like dataset/datos_validacion.json.
+    with open(path, "w") as file:
+        for user_name, ancestors in responses:
+            json.dump([{"user_name": user_name, "ancestors": ancestors}], file)
+            file.write("\n")
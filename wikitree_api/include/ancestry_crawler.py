@@ -0,0 +1,59 @@
+from include.family_tree_dag import FamilyTreeDAG
+
+
+class AncestryCrawler:
+    # Grows the ancestries of two individuals one generation at a time,
+    # alternating sides, instead of fetching a fixed-depth pedigree for each.
+    # Only profiles that have not been fetched yet are requested, and the
+    # crawl stops as soon as the two sides share a profile, so the number of
+    # requests follows the depth at which they meet.
+    def __init__(self, api, max_generations=30):
+        self.api = api
+        self.max_generations = max_generations
+        self.profiles = {}
+
+    def crawl(self, individual1, individual2, dag=None):
+        if dag is None:
+            dag = FamilyTreeDAG([], [], individual1, individual2)
+        starts = {profile['Name']: profile for profile in self.api.fetch_profiles([individual1, individual2])}
+        sides = []
+        for individual in (individual1, individual2):
+            profile = starts.get(individual)
+            if profile is None:
+                print(f"Could not fetch profile for {individual}")
+                return dag, []
+            self.profiles[profile['Id']] = profile
+            dag.add_ancestors([profile], individual)
+            sides.append({'individual': individual, 'seen': {profile['Id']}, 'frontier': [profile], 'generations': 0})
+
+        meeting = sides[0]['seen'] & sides[1]['seen']
+        turn = 0
+        while not meeting:
+            side, other = sides[turn], sides[1 - turn]
+            if not side['frontier'] or side['generations'] >= self.max_generations:
+                side, other = other, side
+                if not side['frontier'] or side['generations'] >= self.max_generations:
+                    break
+            new_profiles = self._expand(side)
+            dag.add_ancestors(new_profiles, side['individual'])
+            meeting = {profile['Id'] for profile in new_profiles} & other['seen']
+            turn = 1 - turn
+        return dag, [self.profiles[profile_id]['Name'] for profile_id in meeting]
+
+    def _expand(self, side):
+        parent_ids = []
+        for profile in side['frontier']:
+            for parent_id in (profile.get('Father'), profile.get('Mother')):
+                if parent_id and parent_id not in side['seen']:
+                    parent_ids.append(parent_id)
+        missing = [parent_id for parent_id in parent_ids if parent_id not in self.profiles]
+        for profile in self.api.fetch_profiles(missing):
+            self.profiles[profile['Id']] = profile
+        new_profiles = []
+        for parent_id in dict.fromkeys(parent_ids):
+            if parent_id in self.profiles:
+                side['seen'].add(parent_id)
+                new_profiles.append(self.profiles[parent_id])
+        side['frontier'] = new_profiles
+        side['generations'] += 1
+        return new_profiles
@@ -0,0 +1,241 @@
+from array import array
+
+
+class CSRFamilyTree:
+    # Profiles are interned by WikiTree Id into dense integers and parent and
+    # child adjacency is stored as CSR arrays (an offsets array plus a flat
+    # indices array), so a node costs a handful of machine words instead of
+    # a networkx dict-of-dicts.
+    def __init__(self, ancestors1, ancestors2, individual1=None, individual2=None):
+        # Same signature as FamilyTreeDAG, so either can be built from the
+        # same call. The individuals are not used: every profile already
+        # names its own parents.
+        self._build(list(ancestors1) + list(ancestors2))
+
+    @classmethod
+    def from_profiles(cls, profiles):
+        tree = cls.__new__(cls)
+        tree._build(profiles)
+        return tree
+
+    @classmethod
+    def from_dag(cls, dag):
+        # Converts a FamilyTreeDAG edge for edge (self-loops included, so
+        # get_ancestors agrees on both), keeping its generation index and,
+        # for FamilyTreeDAG.load, the profiles each individual has merged
+        # (individual rows plus a CSR of their profile rows, in merge order).
+        tree = cls.__new__(cls)
+        order = dag.topological_order()
+        tree.names = list(dag.graph)
+        tree.index_of_name = {name: index for index, name in enumerate(tree.names)}
+        tree.index_of_id = {profile_id: tree.index_of_name[name] for profile_id, name in dag.profile_names.items()}
+        tree.ids = array('q', [0] * len(tree.names))
+        tree.fathers = array('q', [0] * len(tree.names))
+        tree.mothers = array('q', [0] * len(tree.names))
+        for profile_id, index in tree.index_of_id.items():
+            tree.ids[index] = profile_id
+        for name, (father_id, mother_id) in dag._parent_ids.items():
+            tree.fathers[tree.index_of_name[name]] = father_id
+            tree.mothers[tree.index_of_name[name]] = mother_id
+        edges = [(tree.index_of_name[parent], tree.index_of_name[child]) for parent, child in dag.graph.edges()]
+        tree.individuals = array('l')
+        tree.known_offsets = array('l', [0])
+        tree.known_rows = array('l')
+        for individual, known in dag._known_ids.items():
+            tree.individuals.append(tree.index_of_name[individual])
+            tree.known_rows.extend(tree.index_of_id[profile_id] for profile_id in known)
+            tree.known_offsets.append(len(tree.known_rows))
+        tree.parent_offsets, tree.parent_indices = tree._compress(edges, 1, 0)
+        tree.child_offsets, tree.child_indices = tree._compress(edges, 0, 1)
+        tree.num_nodes = len(tree.names)
+        tree.num_edges = len(edges)
+        tree.order = array('l', (tree.index_of_name[node] for node in order))
+        tree.generations = array('l', [-1] * len(tree.names))
+        for node in order:
+            generation = dag.generation(node)
+            if generation is None:
+                generation = 0 if dag.graph.in_degree(node) == 0 else -1
+            tree.generations[tree.index_of_name[node]] = generation
+        return tree
+
+    @classmethod
+    def load(cls, path):
+        from include.snapshot import load_snapshot
+
+        return load_snapshot(path)
+
+    def save(self, path):
+        from include.snapshot import save_snapshot
+
+        save_snapshot(self, path)
+
+    def _build(self, profiles):
+        self.ids = array('q')
+        self.names = []
+        self.index_of_id = {}
+        self.index_of_name = {}
+        self.fathers = array('q')
+        self.mothers = array('q')
+        for profile in profiles:
+            profile_id = profile['Id']
+            if profile_id in self.index_of_id:
+                continue
+            self.index_of_id[profile_id] = len(self.ids)
+            self.index_of_name[profile['Name']] = len(self.ids)
+            self.ids.append(profile_id)
+            self.names.append(profile['Name'])
+            self.fathers.append(profile['Father'] or 0)
+            self.mothers.append(profile['Mother'] or 0)
+
+        edges = []
+        for child in range(len(self.ids)):
+            for parent_id in (self.fathers[child], self.mothers[child]):
+                parent = self.index_of_id.get(parent_id) if parent_id else None
+                if parent is not None and parent != child:
+                    edges.append((parent, child))
+        self.parent_offsets, self.parent_indices = self._compress(edges, 1, 0)
+        self.child_offsets, self.child_indices = self._compress(edges, 0, 1)
+        self.num_nodes = len(self.ids)
+        self.num_edges = len(edges)
+        self.individuals = array('l')
+        self.known_offsets = array('l', [0])
+        self.known_rows = array('l')
+        self._build_generation_index()
+
+    def _compress(self, edges, key, value):
+        offsets = array('l', [0] * (len(self.ids) + 1))
+        for edge in edges:
+            offsets[edge[key] + 1] += 1
+        for node in range(len(self.ids)):
+            offsets[node + 1] += offsets[node]
+        indices = array('l', [0] * len(edges))
+        cursor = array('l', offsets[:-1])
+        for edge in edges:
+            indices[cursor[edge[key]]] = edge[value]
+            cursor[edge[key]] += 1
+        return offsets, indices
+
+    def _build_generation_index(self):
+        # Same convention as FamilyTreeDAG: roots are generation 0 and every
+        # other node is one more than its closest parent. -1 marks nodes that
+        # never reach the topological order, which only happens on a cycle.
+        in_degree = array('l', (self.parent_offsets[node + 1] - self.parent_offsets[node] for node in range(len(self.ids))))
+        self.generations = array('l', [-1] * len(self.ids))
+        self.order = array('l')
+        pending = [node for node in range(len(self.ids)) if in_degree[node] == 0]
+        while pending:
+            node = pending.pop()
+            self.order.append(node)
+            parents = self._parents(node)
+            self.generations[node] = min(self.generations[parent] for parent in parents) + 1 if len(parents) else 0
+            for child in self._children(node):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    pending.append(child)
+
+    def _parents(self, index):
+        return self.parent_indices[self.parent_offsets[index]:self.parent_offsets[index + 1]]
+
+    def _children(self, index):
+        return self.child_indices[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def index_of(self, node):
+        index = self.index_of_name.get(node)
+        if index is None:
+            index = self.index_of_id.get(node)
+        return index
+
+    def __contains__(self, node):
+        return self.index_of(node) is not None
+
+    def graph_size(self):
+        return self.num_nodes, self.num_edges
+
+    def topological_order(self):
+        return [self.names[node] for node in self.order]
+
+    def relationship_matrix(self, individuals):
+        from include.family_tree_dag import ProfileParents
+        from include.kinship import relationship_matrix
+
+        return relationship_matrix(ProfileParents(self), individuals)
+
+    def get_parents(self, node):
+        index = self.index_of(node)
+        if index is None:
+            return []
+        return [self.names[parent] for parent in self._parents(index)]
+
+    def _profile_parents(self, index):
+        parents = []
+        for parent_id in (self.fathers[index], self.mothers[index]):
+            parent = self.index_of_id.get(parent_id) if parent_id else None
+            if parent is not None and parent != index:
+                parents.append(parent)
+        return parents
+
+    def profile_parents(self, node):
+        # Same as get_parents for a tree built from profiles; a tree
+        # converted from a FamilyTreeDAG keeps that graph's extra edges in
+        # its parent CSR, so this reads the profiles' Father and Mother.
+        index = self.index_of(node)
+        if index is None:
+            return []
+        return [self.names[parent] for parent in self._profile_parents(index)]
+
+    def get_children(self, node):
+        index = self.index_of(node)
+        if index is None:
+            return []
+        return [self.names[child] for child in self._children(index)]
+
+    def find_root(self, node):
+        index = self.index_of(node)
+        if index is None:
+            return None
+        seen = {index}
+        stack = list(self._parents(index))
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            parents = self._parents(current)
+            if not len(parents):
+                return self.names[current]
+            stack.extend(parents)
+        return None
+
+    def generation(self, node):
+        index = self.index_of(node)
+        if index is None or self.generations[index] <= 0:
+            return None
+        return self.generations[index]
+
+    def get_depth(self, node):
+        depth = self.generation(node)
+        if depth is not None:
+            print(f"Depth from root to node: {depth}")
+        return depth
+
+    def to_networkx(self):
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.names)
+        for child in range(len(self.ids)):
+            for parent in self._parents(child):
+                graph.add_edge(self.names[parent], self.names[child])
+        return graph
+
+    def visualize_tree(self, root, filename):
+        import networkx as nx
+        from networkx.drawing.nx_agraph import graphviz_layout
+        import matplotlib.pyplot as plt
+
+        graph = self.to_networkx()
+        pos = graphviz_layout(graph, prog='dot', root=root)
+        plt.figure(figsize=(8, 8))
+        nx.draw(graph, pos, with_labels=True, arrows=False)
+        plt.savefig(filename)
+        plt.close()
@@ -1,36 +1,59 @@
 import networkx as nx
-from networkx.drawing.nx_agraph import graphviz_layout
-import matplotlib.pyplot as plt
+
+from include.instrumentation import metrics
 
 class FamilyTreeDAG:
-    def __init__(self, ancestors1, ancestors2, individual1, individual2):
+    def __init__(self, ancestors1=(), ancestors2=(), individual1=None, individual2=None):
         self.graph = nx.DiGraph()
         self.ancestors = {}
         self.num_nodes = 0
         self.num_edges = 0
-        self.graph.add_node(individual1)
-        self.graph.add_node(individual2)
-        self._build_graph(ancestors1, individual1)
-        self._build_graph(ancestors2, individual2)
+        self.profile_names = {}
+        self._parent_ids = {}
+        self._known_ids = {}
+        self._waiting_children = {}
+        self._touched = set()
+        self._watchers = []
+        self._build_generation_index()
+        for ancestors, individual in ((ancestors1, individual1), (ancestors2, individual2)):
+            if individual is not None:
+                self.add_ancestors(ancestors, individual)
 
-    def _build_graph(self, ancestors, individual):
-        id_to_name = {ancestor['Id']: ancestor['Name'] for ancestor in ancestors}
+    def add_ancestors(self, ancestors, individual):
+        # Merges an ancestry into the graph. Ancestors can arrive in several
+        # batches (e.g. one generation at a time) and profiles are
+        # deduplicated by WikiTree Id. An edge from a parent is only added
+        # once that parent's profile has been seen, so children wait for
+        # parents that have not arrived yet. The generation index catches up
+        # with the new nodes the next time it is used.
+        known = self._known_ids.setdefault(individual, {})
+        if individual not in self.graph:
+            self.graph.add_node(individual)
+            self._touched.add(individual)
+        new_ancestors = []
         for ancestor in ancestors:
+            if ancestor['Id'] not in known:
+                known[ancestor['Id']] = ancestor['Name']
+                new_ancestors.append(ancestor)
+        new_profiles = []
+        for ancestor in new_ancestors:
             ancestor_id = ancestor['Name']
             father_id = ancestor['Father']
             mother_id = ancestor['Mother']
 
-            self.num_nodes += 1
-
-            self.graph.add_edge(ancestor_id, individual)
-            if father_id:
-                father_name = id_to_name.get(father_id)
-                if father_name:
-                    self.graph.add_edge(str(father_id), ancestor_id)
-            if mother_id:
-                mother_name = id_to_name.get(mother_id)
-                if mother_name:
-                    self.graph.add_edge(str(mother_id), ancestor_id)
+            self._add_edge(ancestor_id, individual)
+            if ancestor['Id'] not in self.profile_names:
+                self.profile_names[ancestor['Id']] = ancestor_id
+                self._parent_ids[ancestor_id] = (father_id or 0, mother_id or 0)
+                self.num_nodes += 1
+                new_profiles.append(ancestor)
+                for parent_id in (father_id, mother_id):
+                    if not parent_id:
+                        continue
+                    if parent_id in self.profile_names:
+                        self._add_edge(str(parent_id), ancestor_id)
+                    else:
+                        self._waiting_children.setdefault(parent_id, []).append(ancestor_id)
 
             if individual not in self.ancestors:
                 self.ancestors[individual] = set()
@@ -39,10 +62,195 @@ class FamilyTreeDAG:
                 self.ancestors[individual].add(father_id)
             if mother_id:
                 self.ancestors[individual].add(mother_id)
+        for ancestor in new_profiles:
+            for child in self._waiting_children.pop(ancestor['Id'], ()):
+                self._add_edge(str(ancestor['Id']), child)
+
+    def save(self, path):
+        from include.snapshot import save_snapshot
+
+        save_snapshot(self, path)
+
+    @classmethod
+    def load(cls, path):
+        # Restores a graph written by save, generation index included, so it
+        # can keep taking add_ancestors. For read-only use,
+        # CSRFamilyTree.load maps the same file without building a graph.
+        from include.snapshot import load_snapshot
+
+        tree = load_snapshot(path)
+        names = list(tree.names)
+        dag = cls()
+        dag.graph.add_nodes_from(names)
+        for child in range(len(names)):
+            for parent in tree._parents(child):
+                dag.graph.add_edge(names[parent], names[child])
+        dag.num_edges = len(tree.parent_indices)
+        dag.profile_names = {tree.ids[node]: names[node] for node in range(len(names)) if tree.ids[node]}
+        dag._parent_ids = {names[node]: (tree.fathers[node], tree.mothers[node]) for node in range(len(names)) if tree.ids[node]}
+        dag.num_nodes = len(dag.profile_names)
+        # add_ancestors fills ancestors from the first profile merged for an
+        # individual plus the Father and Mother Ids of every one of them.
+        for position, individual in enumerate(tree.individuals):
+            rows = tree.known_rows[tree.known_offsets[position]:tree.known_offsets[position + 1]]
+            dag._known_ids[names[individual]] = {tree.ids[row]: names[row] for row in rows}
+            if len(rows):
+                ancestors = dag.ancestors[names[individual]] = {names[rows[0]]}
+                ancestors.update(parent_id for row in rows for parent_id in (tree.fathers[row], tree.mothers[row]) if parent_id)
+        # A child waits for every parent Id whose profile has not arrived.
+        for name, parent_ids in dag._parent_ids.items():
+            for parent_id in parent_ids:
+                if parent_id and parent_id not in dag.profile_names:
+                    dag._waiting_children.setdefault(parent_id, []).append(name)
+        dag._topological_order = [names[node] for node in tree.order]
+        for label, node in enumerate(tree.order):
+            dag._labels[names[node]] = label
+            dag._generations[names[node]] = tree.generations[node] if tree.generations[node] >= 0 else None
+        dag._next_label = len(tree.order)
+        dag._indexed_size = dag.graph_size()
+        return dag
+
+    def watch(self):
+        # Returns a list that every later change is appended to, for indexes
+        # kept outside the graph (see LCAQueryEngine) that follow it
+        # incrementally: ('edge', parent, child) for a new edge,
+        # ('generation', node) when a node's generation is set or changes and
+        # ('rebuild',) when the generation index was rebuilt from scratch.
+        changes = []
+        self._watchers.append(changes)
+        return changes
+
+    def _notify(self, *change):
+        for changes in self._watchers:
+            changes.append(change)
+
+    def _add_edge(self, parent, child):
+        if not self.graph.has_edge(parent, child):
+            if parent not in self.graph:
+                self._touched.add(parent)
+            self.graph.add_edge(parent, child)
+            self.num_edges += 1
+            self._touched.add(child)
+            self._notify('edge', parent, child)
+
+    def _build_generation_index(self):
+        metrics.count('generation_index.builds')
+        # Kahn's algorithm over the graph, ignoring self-loops. Sources get
+        # generation 0 and every other node is one more than its closest
+        # parent, which is the shortest distance from any root above it.
+        self._generations = {}
+        self._labels = {}
+        self._next_label = 0
+        self._topological_order = self._sort_generations(self.graph, notify=False)
+        self._touched = set()
+        self._indexed_size = self.graph_size()
+        self._notify('rebuild')
+
+    def _update_generation_index(self):
+        # Only nodes that are new or gained a parent, and everything below
+        # them, can change generation or position, so just that part of the
+        # graph goes through Kahn's algorithm again. Its nodes are then
+        # labelled after every other node, which keeps the order valid since
+        # nothing outside it descends from it. While the graph has a cycle,
+        # or when most of it is new, the index is rebuilt in full instead.
+        touched, self._touched = self._touched, set()
+        if len(self._labels) != self._indexed_size[0] or len(touched) * 2 > self.graph.number_of_nodes():
+            self._build_generation_index()
+            return
+        metrics.count('generation_index.updates')
+        region = set(touched)
+        stack = list(touched)
+        while stack:
+            for child in self.graph.successors(stack.pop()):
+                if child not in region:
+                    region.add(child)
+                    stack.append(child)
+        order = self._sort_generations(self.graph.subgraph(region), notify=True)
+        if len(order) != len(region):
+            self._build_generation_index()
+            return
+        self._topological_order = None
+        self._indexed_size = self.graph_size()
+
+    def _sort_generations(self, graph, notify):
+        # Numbers and labels the nodes of graph in topological order. Parents
+        # outside graph keep the generation they already have.
+        order = []
+        in_degree = {}
+        for node in graph:
+            in_degree[node] = sum(1 for parent in graph.predecessors(node) if parent != node)
+        pending = [node for node, degree in in_degree.items() if degree == 0]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            self._labels[node] = self._next_label
+            self._next_label += 1
+            parents = [parent for parent in self.graph.predecessors(node) if parent != node]
+            if not parents:
+                generation = 0 if self.graph.in_degree(node) == 0 else None
+            else:
+                known = [self._generations[parent] for parent in parents if self._generations[parent] is not None]
+                generation = min(known) + 1 if known else None
+            if notify and (node not in self._generations or self._generations[node] != generation):
+                self._notify('generation', node)
+            self._generations[node] = generation
+            for child in graph.successors(node):
+                if child == node:
+                    continue
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    pending.append(child)
+        return order
+
+    def update_index(self):
+        if self._touched:
+            self._update_generation_index()
+        if self._indexed_size != self.graph_size():
+            self._build_generation_index()
+
+    def graph_size(self):
+        # networkx counts edges by walking every node, so the edge count is
+        # kept up to date by _add_edge instead.
+        return self.graph.number_of_nodes(), self.num_edges
+
+    def __contains__(self, node):
+        return node in self.graph
+
+    def generation(self, node):
+        self.update_index()
+        if node not in self._generations:
+            # Nodes on a cycle never reach the topological order.
+            return self._legacy_depth(node)
+        # Roots have no root above them, so like get_depth they have no depth.
+        if self._generations[node] == 0:
+            return None
+        return self._generations[node]
+
+    def topological_order(self):
+        self.update_index()
+        if self._topological_order is None:
+            self._topological_order = sorted(self._labels, key=self._labels.get)
+        return self._topological_order
+
+    def get_children(self, node):
+        return list(self.graph.successors(node))
+
+    def relationship_matrix(self, individuals):
+        from include.kinship import relationship_matrix
+
+        return relationship_matrix(ProfileParents(self), individuals)
 
     def get_parents(self, node):
         return list(self.graph.predecessors(node))
 
+    def profile_parents(self, node):
+        # The father and mother recorded on node's profile. get_parents also
+        # has an edge from every ancestor of an individual (the individual
+        # included) and from parent Id nodes, so anything that counts
+        # generations goes through this instead.
+        return [self.profile_names[parent_id] for parent_id in self._parent_ids.get(node, ())
+                if parent_id in self.profile_names]
+
     def find_root(self, node):
         root = None
         for n in nx.ancestors(self.graph, node):
@@ -53,27 +261,52 @@ class FamilyTreeDAG:
                 print("No root found")
         return root
 
-    def visualize_tree(self, root, filename):
-        pos = graphviz_layout(self.graph, prog='dot', root=root)
+    def visualize_tree(self, root, filename, individual=None):
+        # Plotting libraries are slow to import and only needed here.
+        from networkx.drawing.nx_agraph import graphviz_layout
+        import matplotlib.pyplot as plt
+
+        # With an individual, only that person's ancestry is laid out.
+        graph = self.graph
+        if individual is not None:
+            graph = self.graph.subgraph(nx.ancestors(self.graph, individual) | {individual})
+        pos = graphviz_layout(graph, prog='dot', root=root)
         plt.figure(figsize=(8, 8))
-        nx.draw(self.graph, pos, with_labels=True, arrows=False)
+        nx.draw(graph, pos, with_labels=True, arrows=False)
         plt.savefig(filename)
         plt.close()
 
     def get_depth(self, node):
+        metrics.count('get_depth.calls')
+        depth = self.generation(node)
+        if depth is not None:
+            print(f"Depth from root to node: {depth}")
+        return depth
+
+    def _legacy_depth(self, node):
+        if node not in self.graph:
+            return None
         root = self.find_root(node)
-        if root is not None:
-            path_length = nx.shortest_path_length(self.graph, root)
-            depth = path_length[node] if node in path_length else None
-            if depth is not None:
-                print(f"Depth from root to node: {depth}")
-            else:
-                print(f"No path from root to node")
-            return depth
-        else:
+        if root is None:
             return None
+        path_length = nx.shortest_path_length(self.graph, root)
+        return path_length.get(node)
+
+class ProfileParents:
+    # Presents a FamilyTreeDAG or CSRFamilyTree with profile_parents as its
+    # get_parents, for the functions here that take any backend.
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __contains__(self, node):
+        return node in self.tree
+
+    def get_parents(self, node):
+        return self.tree.profile_parents(node)
 
 def get_ancestors(node, graph, memo=None, visited=None):
+    # Walks up with an explicit stack, so deep pedigrees do not run into
+    # the recursion limit.
     if memo is None:
         memo = {}
     if visited is None:
@@ -83,20 +316,88 @@ def get_ancestors(node, graph, memo=None, visited=None):
         return memo[node]
 
     ancestors = set()
-    for parent in graph.get_parents(node):
-        if parent in visited:
-            continue
-        visited.add(parent)
-        ancestors.add(parent)
-        ancestors.update(get_ancestors(parent, graph, memo, visited))
+    stack = [node]
+    expanded = 0
+    while stack:
+        expanded += 1
+        for parent in graph.get_parents(stack.pop()):
+            if parent in visited:
+                continue
+            visited.add(parent)
+            ancestors.add(parent)
+            stack.append(parent)
+    # Nodes whose parents were looked up, what the recursive version
+    # counted as calls.
+    metrics.count('get_ancestors.nodes', expanded)
 
     memo[node] = ancestors
     return ancestors
 
+def iter_generations(node, graph):
+    # Yields the ancestors of node one generation at a time, each one a set
+    # of nodes not seen in a closer generation. Works with any backend that
+    # has get_parents and only holds the nodes reached so far.
+    seen = {node}
+    frontier = [node]
+    while frontier:
+        next_frontier = []
+        for child in frontier:
+            for parent in graph.get_parents(child):
+                if parent not in seen:
+                    seen.add(parent)
+                    next_frontier.append(parent)
+        if next_frontier:
+            yield set(next_frontier)
+        frontier = next_frontier
+
+def find_lca_bidirectional(individual1, individual2, graph, label=str):
+    # Nearest common ancestor (fewest generations up from both, an
+    # individual counting as its own ancestor) without building either
+    # ancestor set in full: the side with the smaller frontier climbs one
+    # generation at a time and every node it reaches is checked against
+    # the other side. The search stops once no node left to find could make
+    # a meeting as close as the best one so far. Ties go to the smallest
+    # label(node), so the answer does not depend on set iteration order.
+    if individual1 not in graph or individual2 not in graph:
+        return None
+    if individual1 == individual2:
+        return individual1
+    sides = []
+    for individual in (individual1, individual2):
+        # unmatched counts, per generation, the nodes the other side has not
+        # reached yet; a meeting still to come through one of them is at
+        # least that generation plus one more than the other side's depth.
+        sides.append({'up': {individual: 0}, 'frontier': {individual}, 'depth': 0, 'unmatched': {0: 1},
+                      'generations': iter_generations(individual, graph)})
+    best, lca = float('inf'), None
+    while True:
+        depth = [side['depth'] if side['frontier'] else float('inf') for side in sides]
+        closest = [min((generation for generation, count in side['unmatched'].items() if count), default=float('inf'))
+                   for side in sides]
+        if min(depth[0] + depth[1] + 2, depth[0] + 1 + closest[1], depth[1] + 1 + closest[0]) > best:
+            break
+        side, other = sorted(sides, key=lambda side: len(side['frontier']) if side['frontier'] else float('inf'))
+        if not side['frontier']:
+            break
+        side['frontier'] = next(side['generations'], set())
+        side['depth'] += 1
+        metrics.count('find_lca_bidirectional.generations')
+        for node in side['frontier']:
+            side['up'][node] = side['depth']
+            if node in other['up']:
+                other['unmatched'][other['up'][node]] -= 1
+                meeting = side['depth'] + other['up'][node]
+                if meeting < best or (meeting == best and label(node) < label(lca)):
+                    best, lca = meeting, node
+            else:
+                side['unmatched'][side['depth']] = side['unmatched'].get(side['depth'], 0) + 1
+    return lca
+
 def lowest_common_ancestor(individual1, individual2, dag):
     ancestors1 = get_ancestors(individual1, dag)
     ancestors2 = get_ancestors(individual2, dag)
     common_ancestors = ancestors1.intersection(ancestors2)
+    metrics.count('lowest_common_ancestor.common_ancestors', len(common_ancestors))
 
     if not common_ancestors:
         return None
@@ -104,7 +405,7 @@ def lowest_common_ancestor(individual1, individual2, dag):
     min_depth = float('inf')
     lca = None
     for ancestor in common_ancestors:
-        depth = dag.get_depth(ancestor)
+        depth = dag.generation(ancestor)
         if depth is None:
             continue
         if depth < min_depth:
@@ -0,0 +1,94 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_DISABLED = nullcontext()
+
+
+class Instrumentation:
+    # Collects per-stage wall time, call counts and (optionally) peak memory,
+    # plus free-form counters such as bytes fetched or cache hits. While
+    # disabled, stage() returns a shared no-op context manager and count()
+    # returns straight away, so instrumented code pays one attribute check.
+    def __init__(self):
+        self.enabled = False
+        self.track_memory = False
+        self.profile_dir = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+        self._stack = []
+        self._profiler = None
+
+    def enable(self, track_memory=False, profile_dir=None):
+        self.enabled = True
+        self.track_memory = track_memory
+        self.profile_dir = profile_dir
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def stage(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        # Peak memory is tracked per stage; a nested stage hands its peak on
+        # to the stage around it so the outer peak is not lost by the reset.
+        if self.track_memory:
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        profiler = None
+        if self.profile_dir is not None and self._profiler is None:
+            profiler = self._profiler = cProfile.Profile()
+            profiler.enable()
+        frame = [name, 0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            if self.track_memory:
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                stats['peak_memory_bytes'] = max(stats.get('peak_memory_bytes', 0), peak)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+            if profiler is not None:
+                profiler.disable()
+                self._profiler = None
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.{stats['calls']}.prof"))
+
+    def report(self):
+        return {'stages': self.stages, 'counters': self.counters}
+
+    def write_report(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+metrics = Instrumentation()
@@ -0,0 +1,202 @@
+from collections import namedtuple
+
+import numpy as np
+
+RelationshipMatrix = namedtuple(
+    'RelationshipMatrix', ['individuals', 'lca', 'generations', 'cousin_degree', 'removed', 'kinship'])
+
+
+def relationship_matrix(dag, individuals):
+    # Relatedness of every pair among individuals, computed from passes over
+    # their topologically ordered ancestry with NumPy rows:
+    #   lca[i, j]           nearest common ancestor (None on the diagonal)
+    #   generations[i, j]   generations from individuals[i] up to lca[i, j]
+    #   cousin_degree[i, j] min(up_i, up_j) - 1, so siblings are 0, first cousins 1
+    #                       and a direct line (one is the lca) is -1
+    #   removed[i, j]       |up_i - up_j|
+    #   kinship[i, j]       kinship coefficient (tabular method)
+    # Other integer entries are -1 where the pair has no common ancestor.
+    individuals = list(individuals)
+    for individual in individuals:
+        if individual not in dag:
+            raise KeyError(individual)
+
+    # dag.get_parents must be the parent relation itself (at most a father
+    # and a mother), as ProfileParents gives for either backend. The
+    # ancestry is put in topological order here, since the backend's own
+    # order follows its full edge set.
+    node_parents = {}
+    stack = list(individuals)
+    while stack:
+        node = stack.pop()
+        if node in node_parents:
+            continue
+        node_parents[node] = dag.get_parents(node)
+        if len(node_parents[node]) > 2:
+            raise ValueError(f"{node} has more than two parents")
+        stack.extend(node_parents[node])
+    node_children = {node: [] for node in node_parents}
+    waiting = {}
+    for node, parents in node_parents.items():
+        waiting[node] = len(parents)
+        for parent in parents:
+            node_children[parent].append(node)
+    order = [node for node, count in waiting.items() if count == 0]
+    for node in order:
+        for child in node_children[node]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    if len(order) != len(node_parents):
+        raise ValueError("The ancestry of these individuals contains a cycle")
+
+    # Re-order by level, placing every node as late as it can go: one level
+    # above its earliest child, with the individuals at the bottom. No node
+    # shares a level with its own ancestor, and a node is only held for the
+    # levels between itself and its children, which keeps the sweep below
+    # narrow.
+    child_levels = {}
+    levels = []
+    for node in reversed(order):
+        level = min(child_levels.get(node, [1])) - 1
+        levels.append(level)
+        for parent in node_parents[node]:
+            child_levels.setdefault(parent, []).append(level)
+    levels.reverse()
+    ranked = sorted(zip(levels, order), key=lambda pair: pair[0])
+    levels = [level for level, _ in ranked]
+    order = [node for _, node in ranked]
+    position = {node: index for index, node in enumerate(order)}
+    size = len(order)
+    parents = []
+    children = [[] for _ in order]
+    for index, node in enumerate(order):
+        parents.append([position[parent] for parent in node_parents[node]])
+        for parent in parents[-1]:
+            children[parent].append(index)
+    columns = [position[individual] for individual in individuals]
+    count = len(individuals)
+    column_set = set(columns)
+
+    kinship = _kinship(parents, children, columns, levels)
+
+    # Going back up the order, level by level: how many generations up from
+    # each individual a node is (an individual is 0 from itself, so direct
+    # lines are covered too). unreachable marks nodes that are not an
+    # ancestor of that individual.
+    unreachable = np.iinfo(np.int64).max // 4
+    distance = np.full((size, count), unreachable, dtype=np.int64)
+    distance[columns, np.arange(count)] = 0
+    edges = sorted((levels[parent], parent, child) for child, node_parents in enumerate(parents) for parent in node_parents)
+    edge_levels = np.array([level for level, _, _ in edges], dtype=np.int64)
+    edge_parents = np.array([parent for _, parent, _ in edges], dtype=np.int64)
+    edge_children = np.array([child for _, _, child in edges], dtype=np.int64)
+    bounds = np.flatnonzero(np.diff(edge_levels)) + 1
+    for level_parents, level_children in reversed(list(zip(np.split(edge_parents, bounds), np.split(edge_children, bounds)))):
+        np.minimum.at(distance, level_parents, distance[level_children] + 1)
+    is_ancestor = distance < unreachable
+
+    # The common ancestor of a pair is the one fewest generations away from
+    # both (up_i + up_j). If some child of a node is on a shortest path to
+    # both individuals, that child scores better, so a node only competes
+    # for pairs whose shortest paths leave it through different children.
+    # That rules out every node with a single child outright. Equal scores
+    # go to the smallest label, as in find_lca_bidirectional.
+    label_rank = np.empty(size + 1, dtype=np.int64)
+    label_rank[sorted(range(size), key=lambda index: str(order[index]))] = np.arange(size)
+    label_rank[size] = size
+    lca_index = np.full((count, count), -1, dtype=np.int64)
+    best = np.full((count, count), unreachable, dtype=np.int64)
+    for index in reversed(range(size)):
+        node_children = children[index]
+        if len(node_children) < 2 and index not in column_set:
+            continue
+        members = np.flatnonzero(is_ancestor[index])
+        if members.size < 2:
+            continue
+        member_distance = distance[index, members]
+        if len(node_children) <= 63:
+            via = np.zeros(members.size, dtype=np.int64)
+            for bit, child in enumerate(node_children):
+                via |= (distance[child, members] + 1 == member_distance).astype(np.int64) << bit
+            first, second = np.nonzero((via[:, None] & via[None, :]) == 0)
+        else:
+            first, second = np.nonzero(np.ones((members.size, members.size), dtype=bool))
+        rows, cols = members[first], members[second]
+        scores = member_distance[first] + member_distance[second]
+        current = best[rows, cols]
+        closer = (scores < current) | ((scores == current) & (label_rank[index] < label_rank[lca_index[rows, cols]]))
+        best[rows[closer], cols[closer]] = scores[closer]
+        lca_index[rows[closer], cols[closer]] = index
+    np.fill_diagonal(lca_index, -1)
+
+    found = lca_index >= 0
+    safe_index = np.where(found, lca_index, 0)
+    up = np.where(found, distance[safe_index, np.arange(count)[:, None]], -1)
+    up_other = up.T
+    cousin_degree = np.where(found, np.minimum(up, up_other) - 1, -1)
+    removed = np.where(found, np.abs(up - up_other), -1)
+    # Index -1 picks the trailing None.
+    lca = np.array(order + [None], dtype=object)[lca_index]
+    return RelationshipMatrix(individuals, lca, up, cousin_degree, removed, kinship)
+
+
+def _kinship(parents, children, columns, levels):
+    # Tabular method on the numerator relationship matrix A = 2 * kinship:
+    # a node's relationship to everyone before it is the average over its
+    # two parents (a missing parent counts as unrelated), and its diagonal is
+    # 1 + F with F half the relationship between its parents. Nodes of one
+    # level never descend from each other, so a whole level is filled in at
+    # once. The matrix only holds nodes that still have children to come
+    # (or are one of the individuals), so memory follows the widest
+    # generation, not the whole ancestry.
+    keep = set(columns)
+    remaining = [len(node_children) for node_children in children]
+    live = []
+    row_of = {}
+    matrix = np.zeros((0, 0))
+    start = 0
+    while start < len(parents):
+        end = start
+        while end < len(parents) and levels[end] == levels[start]:
+            end += 1
+        batch = range(start, end)
+
+        # rows[a] is A between node a and every live node, inner[a, b] is A
+        # between two nodes of this level (through b's parents).
+        rows = np.zeros((len(batch), len(live)))
+        inner = np.zeros((len(batch), len(batch)))
+        diagonal = np.ones(len(batch))
+        by_rank = []
+        for rank in range(max(len(parents[index]) for index in batch)):
+            selected = [offset for offset, index in enumerate(batch) if len(parents[index]) > rank]
+            parent_rows = [row_of[parents[batch[offset]][rank]] for offset in selected]
+            rows[selected] += matrix[parent_rows] / 2
+            by_rank.append((selected, parent_rows))
+        for selected, parent_rows in by_rank:
+            inner[:, selected] += rows[:, parent_rows] / 2
+        for offset, index in enumerate(batch):
+            if len(parents[index]) == 2:
+                father, mother = (row_of[parent] for parent in parents[index])
+                diagonal[offset] += matrix[father, mother] / 2
+        np.fill_diagonal(inner, diagonal)
+
+        released = set()
+        for index in batch:
+            for parent in parents[index]:
+                remaining[parent] -= 1
+                if remaining[parent] == 0 and parent not in keep:
+                    released.add(parent)
+        kept = [row for row, node in enumerate(live) if node not in released]
+        width = len(kept)
+        grown = np.empty((width + len(batch), width + len(batch)))
+        grown[:width, :width] = matrix[np.ix_(kept, kept)]
+        grown[width:, :width] = rows[:, kept]
+        grown[:width, width:] = grown[width:, :width].T
+        grown[width:, width:] = inner
+        matrix = grown
+        live = [live[row] for row in kept] + list(batch)
+        row_of = {node: row for row, node in enumerate(live)}
+        start = end
+    individual_rows = [row_of[column] for column in columns]
+    return matrix[np.ix_(individual_rows, individual_rows)] / 2
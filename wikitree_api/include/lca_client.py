@@ -0,0 +1,12 @@
+import json
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+# Only the standard library is imported here, so querying a running
+# lca_server stays fast to start.
+
+
+def query(server, endpoint, timeout=10, **params):
+    url = f"{server.rstrip('/')}/{endpoint}?{urlencode(params)}"
+    with urlopen(url, timeout=timeout) as response:
+        return json.load(response)
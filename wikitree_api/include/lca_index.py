@@ -0,0 +1,135 @@
+from bisect import insort
+
+from include.family_tree_dag import lowest_common_ancestor
+
+
+class LCAQueryEngine:
+    # Each node keeps its ancestor closure as a bitset over all nodes, so
+    # the index takes memory quadratic in the graph; prefer
+    # find_lca_bidirectional where it is large.
+    def __init__(self, dag):
+        self.dag = dag
+        # A graph that reports its changes (FamilyTreeDAG.watch) is followed
+        # incrementally; any other backend is re-indexed when its size changes.
+        self._changes = dag.watch() if hasattr(dag, 'watch') else None
+        self._build_index()
+
+    def _build_index(self):
+        # Every node gets one bit, handed out in the order nodes are first
+        # seen and never moved, and its ancestor closure is the OR of its
+        # parents' closures and bits. Nodes are also grouped by generation,
+        # with the generations kept sorted, so the shallowest common ancestor
+        # can be read straight off the intersection of two closures.
+        self.nodes = []
+        self.positions = {}
+        self.closure = {}
+        self.generations = {}
+        self.generation_masks = {}
+        self.sorted_generations = []
+        for node in self.dag.topological_order():
+            self._add_node(node)
+            for parent in self.dag.get_parents(node):
+                if parent == node:
+                    self.closure[node] |= 1 << self.positions[node]
+                else:
+                    self.closure[node] |= self.closure[parent] | (1 << self.positions[parent])
+            self._set_generation(node)
+        if self._changes is not None:
+            del self._changes[:]
+        self._indexed_size = self.dag.graph_size()
+
+    def _update_index(self):
+        # New edges only ever add ancestors, so closures only grow: a new
+        # edge ORs the parent into the child, and a child whose closure
+        # changed passes it on to its own children. Nothing else is touched.
+        changes = self._changes[:]
+        del self._changes[:]
+        if any(change[0] == 'rebuild' for change in changes):
+            self._build_index()
+            return
+        pending = []
+        for change in changes:
+            for node in change[1:]:
+                if node not in self.positions:
+                    self._add_node(node)
+            if change[0] == 'edge':
+                pending.append(change[1:])
+            else:
+                self._set_generation(change[1])
+        while pending:
+            parent, child = pending.pop()
+            bits = self.closure[child] | self.closure[parent] | (1 << self.positions[parent])
+            if bits != self.closure[child]:
+                self.closure[child] = bits
+                pending.extend((child, grandchild) for grandchild in self.dag.get_children(child) if grandchild != child)
+        self._indexed_size = self.dag.graph_size()
+
+    def _add_node(self, node):
+        self.positions[node] = len(self.nodes)
+        self.nodes.append(node)
+        self.closure[node] = 0
+
+    def _set_generation(self, node):
+        generation = self.dag.generation(node)
+        previous = self.generations.get(node)
+        if generation == previous:
+            return
+        bit = 1 << self.positions[node]
+        if previous is not None:
+            self.generation_masks[previous] ^= bit
+        if generation is not None:
+            if generation not in self.generation_masks:
+                insort(self.sorted_generations, generation)
+            self.generation_masks[generation] = self.generation_masks.get(generation, 0) | bit
+        self.generations[node] = generation
+
+    def _ensure_index(self):
+        if self._changes is not None:
+            self.dag.update_index()
+        if self._changes:
+            self._update_index()
+        elif self._indexed_size != self.dag.graph_size():
+            self._build_index()
+
+    def common_ancestors(self, individual1, individual2):
+        self._ensure_index()
+        return self.closure.get(individual1, 0) & self.closure.get(individual2, 0)
+
+    def lowest_common_ancestor(self, individual1, individual2):
+        self._ensure_index()
+        if individual1 not in self.closure or individual2 not in self.closure:
+            if individual1 in self.dag and individual2 in self.dag:
+                # Only nodes on a cycle are missing from the closure.
+                return lowest_common_ancestor(individual1, individual2, self.dag)
+            return None
+        common = self.closure[individual1] & self.closure[individual2]
+        if not common:
+            return None
+        for generation in self.sorted_generations:
+            candidates = common & self.generation_masks[generation]
+            if candidates:
+                return self.nodes[(candidates & -candidates).bit_length() - 1]
+        return None
+
+    def minimal_common_ancestors(self, individual1, individual2):
+        common = self.common_ancestors(individual1, individual2)
+        covered = 0
+        for node in self._iter_bits(common):
+            covered |= self.closure[node] & ~(1 << self.positions[node])
+        return list(self._iter_bits(common & ~covered))
+
+    def query(self, pairs, all_minimal=False):
+        results = []
+        for individual1, individual2 in pairs:
+            lca = self.lowest_common_ancestor(individual1, individual2)
+            if all_minimal:
+                results.append((lca, self.minimal_common_ancestors(individual1, individual2)))
+            else:
+                results.append(lca)
+        return results
+
+    def _iter_bits(self, bits):
+        while bits:
+            lowest = bits & -bits
+            yield self.nodes[lowest.bit_length() - 1]
+            bits ^= lowest
@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from include.family_tree_dag import ProfileParents, find_lca_bidirectional, get_ancestors
+from include.lca_index import LCAQueryEngine
+from include.tree_renderer import ancestor_subgraph, to_dot
+
+
+class LCAService:
+    # Keeps one loaded graph in memory so every query is a lookup instead of
+    # a fetch, a graph build and a walk. With method 'index', /lca reads the
+    # LCAQueryEngine closures, built on the first /lca query; with
+    # 'bidirectional' it answers with the nearest common ancestor over
+    # profile parents and keeps nothing but the graph.
+    def __init__(self, dag, method='index'):
+        if method not in ('index', 'bidirectional'):
+            raise ValueError(f"Unknown LCA method {method!r}")
+        self.dag = dag
+        self.method = method
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        with self._engine_lock:
+            if self._engine is None:
+                self._engine = LCAQueryEngine(self.dag)
+        return self._engine
+
+    def lca(self, individual1, individual2):
+        if self.method == 'bidirectional':
+            lca = find_lca_bidirectional(individual1, individual2, ProfileParents(self.dag))
+            minimal = None
+        else:
+            lca = self.engine.lowest_common_ancestor(individual1, individual2)
+            minimal = self.engine.minimal_common_ancestors(individual1, individual2)
+        return {
+            'individual1': individual1,
+            'individual2': individual2,
+            'method': self.method,
+            'lca': lca,
+            'minimal': minimal,
+        }
+
+    def ancestors(self, node):
+        if node not in self.dag:
+            return {'node': node, 'ancestors': None}
+        return {'node': node, 'ancestors': sorted(map(str, get_ancestors(node, self.dag)))}
+
+    def depth(self, node):
+        return {'node': node, 'depth': self.dag.generation(node) if node in self.dag else None}
+
+    def dot(self, node):
+        if node not in self.dag:
+            return {'node': node, 'dot': None}
+        nodes, edges = ancestor_subgraph(self.dag, node)
+        return {'node': node, 'dot': to_dot(nodes, edges, node)}
+
+    def handle(self, endpoint, params):
+        if endpoint == 'lca':
+            return self.lca(params['individual1'], params['individual2'])
+        if endpoint == 'ancestors':
+            return self.ancestors(params['node'])
+        if endpoint == 'depth':
+            return self.depth(params['node'])
+        if endpoint == 'dot':
+            return self.dot(params['node'])
+        if endpoint == 'health':
+            nodes, edges = self.dag.graph_size()
+            return {'nodes': nodes, 'edges': edges}
+        raise ValueError(f"Unknown endpoint {endpoint!r}")
+
+
+class _LCARequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            status, body = 200, self.service.handle(url.path.strip('/'), params)
+        except ValueError as err:
+            status, body = 404, {'error': str(err)}
+        except KeyError as err:
+            status, body = 400, {'error': f"Missing parameter {err}"}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    handler = type('LCARequestHandler', (_LCARequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
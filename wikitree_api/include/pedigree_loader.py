@@ -0,0 +1,125 @@
+import json
+
+from include.family_tree_dag import FamilyTreeDAG
+from include.csr_family_tree import CSRFamilyTree
+
+GRAPH_FIELDS = ('Id', 'Name', 'Father', 'Mother')
+
+
+class _JSONStream:
+    # Just enough of an incremental JSON reader to walk the dump's
+    # [{"user_name": ..., "ancestors": [...]}] documents: the surrounding
+    # structure is consumed one character at a time and each profile is
+    # decoded on its own, so only one chunk plus one profile is in memory.
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.bytes_read = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.bytes_read += len(chunk)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f"Expected {character!r} after {self.bytes_read} characters")
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number cut off by the chunk boundary still decodes, so a
+                # value is only trusted when something follows it.
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(max(self.chunk_size, len(self.buffer)))
+
+
+def iter_profiles(path, chunk_size=1 << 20, progress=None, progress_every=100000):
+    # Yields (user_name, profile) for every ancestor in a dump, keeping only
+    # the fields the graph uses.
+    count = 0
+    with open(path, encoding='utf-8') as file:
+        stream = _JSONStream(file, chunk_size)
+        while stream.peek():
+            stream.expect('[')
+            while stream.peek() != ']':
+                if stream.peek() == ',':
+                    stream.expect(',')
+                    continue
+                stream.expect('{')
+                user_name = None
+                while stream.peek() != '}':
+                    if stream.peek() == ',':
+                        stream.expect(',')
+                        continue
+                    key = stream.value()
+                    stream.expect(':')
+                    if key != 'ancestors':
+                        value = stream.value()
+                        if key == 'user_name':
+                            user_name = value
+                        continue
+                    stream.expect('[')
+                    while stream.peek() != ']':
+                        if stream.peek() == ',':
+                            stream.expect(',')
+                            continue
+                        profile = stream.value()
+                        yield user_name, {field: profile.get(field) for field in GRAPH_FIELDS}
+                        count += 1
+                        if progress is not None and count % progress_every == 0:
+                            progress(count, stream.bytes_read)
+                    stream.expect(']')
+                stream.expect('}')
+            stream.expect(']')
+    if progress is not None:
+        progress(count, stream.bytes_read)
+
+
+def load_family_tree(path, batch_size=10000, progress=None):
+    dag = FamilyTreeDAG()
+    batch = []
+    batch_individual = None
+    for individual, profile in iter_profiles(path, progress=progress):
+        if batch and (individual != batch_individual or len(batch) >= batch_size):
+            dag.add_ancestors(batch, batch_individual)
+            batch = []
+        batch_individual = individual
+        batch.append(profile)
+    if batch:
+        dag.add_ancestors(batch, batch_individual)
+    return dag
+
+
+def load_csr_family_tree(path, progress=None):
+    return CSRFamilyTree.from_profiles(profile for _, profile in iter_profiles(path, progress=progress))
+
+
+def print_progress(profiles, bytes_read):
+    print(f"Loaded {profiles} profiles ({bytes_read / 1e6:.1f}M characters read)")
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    # API responses are stored in a single SQLite file keyed by
+    # (action, key, depth). Entries older than ttl seconds are treated as
+    # misses, and once more than max_entries are stored the least recently
+    # used ones are evicted.
+    def __init__(self, path="wikitree_cache.sqlite", ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "action TEXT, key TEXT, depth INTEGER, data TEXT, "
+            "stored_at REAL, accessed_at REAL, "
+            "PRIMARY KEY (action, key, depth))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._connection.commit()
+
+    def get(self, action, key, depth):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data, stored_at FROM responses WHERE action = ? AND key = ? AND depth = ?",
+                (action, str(key), depth),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            data, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE action = ? AND key = ? AND depth = ?",
+                    (action, str(key), depth),
+                )
+                self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE action = ? AND key = ? AND depth = ?",
+                (now, action, str(key), depth),
+            )
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(data)
+
+    def put(self, action, key, depth, data):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (action, str(key), depth, json.dumps(data), now, now),
+            )
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE rowid IN ("
+                    "SELECT rowid FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
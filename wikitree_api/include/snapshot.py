@@ -0,0 +1,185 @@
+import mmap
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+
+from include.csr_family_tree import CSRFamilyTree
+
+# A snapshot is a little-endian header followed by flat arrays, each padded
+# to 8 bytes so they can be cast in place from a memory map:
+#   label_offsets   int64[nodes + 1]  into the UTF-8 label blob
+#   ids             int64[nodes]      WikiTree Id of each node, 0 if none
+#   fathers         int64[nodes]      \ Father and Mother Id on the node's
+#   mothers         int64[nodes]      / profile, 0 if none
+#   parent_offsets  int64[nodes + 1]  \ parent CSR
+#   parent_indices  int64[edges]      /
+#   child_offsets   int64[nodes + 1]  \ child CSR
+#   child_indices   int64[edges]      /
+#   generations     int32[nodes]      -1 where there is none
+#   order           int64[ordered]    topological order
+#   individuals     int64[individuals]      \ nodes ancestries were merged
+#   known_offsets   int64[individuals + 1]  | for and the profiles merged
+#   known_rows      int64[known]            / for each, in merge order
+#   id_keys         int64[ids]        \ Ids in ascending order and the node
+#   id_rows         int64[ids]        / each belongs to
+#   name_table      int64[table]      open addressing on crc32 of the label,
+#                                     node + 1 per used slot
+#   labels          bytes[label_bytes]
+MAGIC = b'WTSNAP02'
+HEADER = struct.Struct('<8s8q')
+
+
+def save_snapshot(tree, path):
+    # Works for CSRFamilyTree and FamilyTreeDAG; the latter is converted
+    # first. LCAQueryEngine closures are not saved.
+    if not isinstance(tree, CSRFamilyTree):
+        tree = CSRFamilyTree.from_dag(tree)
+    names = [str(name) for name in tree.names]
+    labels = [name.encode('utf-8') for name in names]
+    label_offsets = array('q', [0])
+    for label in labels:
+        label_offsets.append(label_offsets[-1] + len(label))
+
+    id_rows = sorted((profile_id, row) for row, profile_id in enumerate(tree.ids) if profile_id)
+    table_size = 16
+    while table_size < 2 * len(names):
+        table_size *= 2
+    name_table = array('q', [0]) * table_size
+    for row, label in enumerate(labels):
+        slot = zlib.crc32(label) & (table_size - 1)
+        while name_table[slot]:
+            slot = (slot + 1) & (table_size - 1)
+        name_table[slot] = row + 1
+
+    sections = [
+        array('q', label_offsets),
+        array('q', tree.ids),
+        array('q', tree.fathers),
+        array('q', tree.mothers),
+        array('q', tree.parent_offsets),
+        array('q', tree.parent_indices),
+        array('q', tree.child_offsets),
+        array('q', tree.child_indices),
+        array('i', tree.generations),
+        array('q', tree.order),
+        array('q', tree.individuals),
+        array('q', tree.known_offsets),
+        array('q', tree.known_rows),
+        array('q', (profile_id for profile_id, _ in id_rows)),
+        array('q', (row for _, row in id_rows)),
+        name_table,
+    ]
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(names), len(tree.parent_indices), len(tree.order),
+                               len(tree.individuals), len(tree.known_rows), len(id_rows), table_size, label_offsets[-1]))
+        for section in sections:
+            data = section.tobytes()
+            file.write(data)
+            file.write(b'\0' * (-len(data) % 8))
+        for label in labels:
+            file.write(label)
+
+
+def load_snapshot(path):
+    # Returns a CSRFamilyTree whose arrays are views on a read-only memory
+    # map, so loading costs the same whatever the size of the graph; pages
+    # are only read from disk when a query touches them.
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    magic, nodes, edges, ordered, individuals, known, ids, table_size, label_bytes = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a family tree snapshot")
+    offset = HEADER.size
+    sections = []
+    for typecode, length in (('q', nodes + 1), ('q', nodes), ('q', nodes), ('q', nodes), ('q', nodes + 1), ('q', edges),
+                             ('q', nodes + 1), ('q', edges), ('i', nodes), ('q', ordered), ('q', individuals),
+                             ('q', individuals + 1), ('q', known), ('q', ids), ('q', ids), ('q', table_size)):
+        size = length * struct.calcsize(typecode)
+        sections.append(view[offset:offset + size].cast(typecode))
+        offset += size + (-size % 8)
+    (label_offsets, node_ids, fathers, mothers, parent_offsets, parent_indices, child_offsets, child_indices,
+     generations, order, individual_rows, known_offsets, known_rows, id_keys, id_rows, name_table) = sections
+
+    tree = CSRFamilyTree.__new__(CSRFamilyTree)
+    tree.names = _Labels(label_offsets, view[offset:offset + label_bytes])
+    tree.ids = node_ids
+    tree.fathers, tree.mothers = fathers, mothers
+    tree.index_of_id = _IdIndex(id_keys, id_rows)
+    tree.index_of_name = _NameTable(name_table, tree.names)
+    tree.parent_offsets, tree.parent_indices = parent_offsets, parent_indices
+    tree.child_offsets, tree.child_indices = child_offsets, child_indices
+    tree.generations = generations
+    tree.order = order
+    tree.individuals = individual_rows
+    tree.known_offsets, tree.known_rows = known_offsets, known_rows
+    tree.num_nodes = nodes
+    tree.num_edges = edges
+    return tree
+
+
+class _Labels:
+    # Node labels decoded from the blob on access.
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return str(self.blob[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+class _IdIndex:
+    def __init__(self, keys, rows):
+        self.keys = keys
+        self.rows = rows
+
+    def get(self, profile_id, default=None):
+        if not isinstance(profile_id, int):
+            return default
+        position = bisect_left(self.keys, profile_id)
+        if position < len(self.keys) and self.keys[position] == profile_id:
+            return self.rows[position]
+        return default
+
+    def __contains__(self, profile_id):
+        return self.get(profile_id) is not None
+
+    def __getitem__(self, profile_id):
+        row = self.get(profile_id)
+        if row is None:
+            raise KeyError(profile_id)
+        return row
+
+
+class _NameTable:
+    def __init__(self, table, names):
+        self.table = table
+        self.names = names
+
+    def get(self, name, default=None):
+        if not isinstance(name, str):
+            return default
+        mask = len(self.table) - 1
+        slot = zlib.crc32(name.encode('utf-8')) & mask
+        while self.table[slot]:
+            row = self.table[slot] - 1
+            if self.names[row] == name:
+                return row
+            slot = (slot + 1) & mask
+        return default
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        row = self.get(name)
+        if row is None:
+            raise KeyError(name)
+        return row
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+
+def ancestor_subgraph(dag, individual):
+    # Only the individual and its ancestors are laid out, not the whole
+    # merged graph. Works with any backend that has get_parents.
+    nodes = {individual}
+    edges = set()
+    stack = [individual]
+    while stack:
+        node = stack.pop()
+        for parent in dag.get_parents(node):
+            edges.add((parent, node))
+            if parent not in nodes:
+                nodes.add(parent)
+                stack.append(parent)
+    return nodes, edges
+
+
+def to_dot(nodes, edges, name="ancestry"):
+    # Nodes and edges are sorted so the same subgraph always gives the same
+    # source, which is what the layout cache is keyed on.
+    lines = [f'digraph "{_escape(name)}" {{', '    node [shape=box];']
+    for node in sorted(nodes, key=str):
+        lines.append(f'    "{_escape(node)}";')
+    for parent, child in sorted(edges, key=lambda edge: (str(edge[0]), str(edge[1]))):
+        lines.append(f'    "{_escape(parent)}" -> "{_escape(child)}";')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_dot(source, filename, cache_dir=None):
+    # The output format comes from the file extension. .dot/.gv files are
+    # written as-is; anything else is laid out by Graphviz's dot program.
+    output_format = os.path.splitext(filename)[1].lstrip('.').lower() or 'svg'
+    if output_format in ('dot', 'gv'):
+        with open(filename, 'w') as file:
+            file.write(source)
+        return filename
+
+    cached = None
+    if cache_dir is not None:
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        cached = os.path.join(cache_dir, f"{key}.{output_format}")
+        if os.path.exists(cached):
+            shutil.copyfile(cached, filename)
+            return filename
+
+    if shutil.which('dot') is None:
+        raise RuntimeError("Graphviz 'dot' program not found; write a .dot file instead")
+    subprocess.run(['dot', f'-T{output_format}', '-o', filename], input=source.encode('utf-8'), check=True)
+    if cached is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        shutil.copyfile(filename, cached)
+    return filename
+
+
+def render_ancestry(dag, individual, filename, cache_dir=None):
+    nodes, edges = ancestor_subgraph(dag, individual)
+    return render_dot(to_dot(nodes, edges, individual), filename, cache_dir)
+
+
+def render_many(dag, jobs, processes=None, cache_dir=None):
+    # jobs is a list of (individual, filename). Subgraphs are extracted here,
+    # so only their DOT source is sent to the worker processes.
+    sources = []
+    for individual, filename in jobs:
+        nodes, edges = ancestor_subgraph(dag, individual)
+        sources.append((to_dot(nodes, edges, individual), filename))
+    if len(sources) == 1 or processes == 1:
+        return [render_dot(source, filename, cache_dir) for source, filename in sources]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(render_dot, source, filename, cache_dir) for source, filename in sources]
+        return [future.result() for future in futures]
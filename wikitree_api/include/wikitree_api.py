@@ -1,15 +1,46 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import threading
+import time
+
+from include.instrumentation import metrics
 
 class WikiTreeAPI:
-    def __init__(self):
-        self.base_url = "https://api.wikitree.com/api.php"
+    def __init__(self, base_url="https://api.wikitree.com/api.php", cache=None, offline=False, dataset=None,
+                 max_workers=8, rate_limit=None, retries=3, backoff=0.5, timeout=30):
+        self.base_url = base_url
+        self.cache = cache
+        self.offline = offline
+        self.dataset = load_dataset(dataset) if dataset else {}
+        self.dataset_profiles = {}
+        for data in self.dataset.values():
+            for entry in data:
+                for profile in entry['ancestors']:
+                    self.dataset_profiles[profile['Id']] = profile
+                    self.dataset_profiles[profile['Name']] = profile
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_limit)
+        # One keep-alive pool shared by every worker thread; urllib3 retries
+        # connection errors and throttling/server errors with backoff.
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def fetch_family_tree_data(self, individual1, individual2):
-        data1, filename1 = self.fetch_ancestors(individual1)
-        data2, filename2 = self.fetch_ancestors(individual2)
-        if not data1 or not data2:
+        results = dict(self.fetch_many([individual1, individual2]))
+        result1 = results[individual1]
+        result2 = results[individual2]
+        if not result1 or not result2:
             return None
+        data1, filename1 = result1
+        data2, filename2 = result2
         return data1[0]['ancestors'], data2[0]['ancestors'], filename1, filename2
 
     def fetch_ancestors(self, individual_id):
@@ -19,16 +50,131 @@ class WikiTreeAPI:
             "key": individual_id,
             "depth": 4
         }
-        response = requests.get(self.base_url, params=params)
+        data = self._lookup(params)
+        filename = None
+        if data is None:
+            data = self._request(params)
+            if data is None:
+                return None
+            # Responses that really came from the API are also written out
+            # as before; cache and dataset hits leave no file behind.
+            filename = f"ancestors_{individual_id}.txt"
+            with open(filename, 'w') as file:
+                json.dump(data, file)
+        return data, filename
+
+    def fetch_many(self, individual_ids, max_workers=None):
+        # Yields (individual_id, fetch_ancestors result) pairs as soon as each
+        # one is ready. Repeated ids are only fetched once.
+        unique_ids = list(dict.fromkeys(individual_ids))
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_ancestors, individual_id): individual_id for individual_id in unique_ids}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def fetch_profiles(self, keys, batch_size=100):
+        # Fetches just the fields the graph needs for a list of WikiTree Ids
+        # or Names through getPeople, at most batch_size keys per request.
+        profiles = []
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in self.dataset_profiles:
+                profiles.append(self.dataset_profiles[key])
+            else:
+                missing.append(key)
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for data in executor.map(self._fetch_people, batches):
+                if not data:
+                    continue
+                people = data[0].get('people') or {}
+                for profile in people.values():
+                    if 'Id' in profile:
+                        profiles.append(profile)
+        return profiles
+
+    def _fetch_people(self, keys):
+        params = {
+            "action": "getPeople",
+            "format": "json",
+            "keys": ",".join(str(key) for key in keys),
+            "fields": "Id,Name,Father,Mother",
+        }
+        return self._get(params)
+
+    def _get(self, params):
+        data = self._lookup(params)
+        if data is None:
+            data = self._request(params)
+        return data
+
+    def _lookup(self, params):
+        # The cache first, then the archived dataset; None if neither has it.
+        action, depth = params["action"], params.get("depth", 0)
+        key = params["key"] if "key" in params else params["keys"]
+        if self.cache is not None:
+            data = self.cache.get(action, key, depth)
+            if data is not None:
+                metrics.count('fetch.cache_hits')
+                return data
+            metrics.count('fetch.cache_misses')
+        if action == "getAncestors" and key in self.dataset:
+            metrics.count('fetch.dataset_hits')
+            return self.dataset[key]
+        return None
+
+    def _request(self, params):
+        action, depth = params["action"], params.get("depth", 0)
+        key = params["key"] if "key" in params else params["keys"]
+        if self.offline:
+            print(f"No cached response for {action} {key} while offline")
+            return None
+
+        self.rate_limiter.wait()
         try:
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
             response.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-            print(f"HTTP error occurred while fetching ancestors for {individual_id}: {err}")
+        except requests.exceptions.RequestException as err:
+            print(f"HTTP error occurred while fetching {action} for {key}: {err}")
             return None
+        metrics.count('fetch.requests')
+        metrics.count('fetch.bytes', len(response.content))
         data = response.json()
+        if self.cache is not None:
+            self.cache.put(action, key, depth, data)
+        return data
 
-        filename = f"ancestors_{individual_id}.txt"
-        with open(filename, 'w') as file:
-            json.dump(data, file)
-        return data, filename
+class RateLimiter:
+    # Spaces requests at least 1/rate seconds apart across all threads.
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
 
+def load_dataset(path):
+    # Archived getAncestors responses are stored one JSON document per
+    # line, so they are decoded one after the other and indexed by the
+    # profile they were requested for.
+    responses = {}
+    decoder = json.JSONDecoder()
+    with open(path) as file:
+        text = file.read()
+    position = 0
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            return responses
+        data, position = decoder.raw_decode(text, position)
+        for entry in data:
+            responses[entry['user_name']] = data
@@ -0,0 +1,144 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from include.csr_family_tree import CSRFamilyTree
+from include.family_tree_dag import find_lca_bidirectional
+from include.pedigree_loader import load_family_tree
+
+_tree = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer many LCA queries from a pairs file across a process pool")
+    parser.add_argument("pairs", help="File with one 'individual1 individual2' pair per line (comma or whitespace separated), or - for stdin")
+    parser.add_argument("--snapshot", help="Graph snapshot written by lca_server.py --save-snapshot")
+    parser.add_argument("--dump", help="Build the graph from an archived pedigree dump instead of a snapshot")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Pairs sent to a worker at a time")
+    args = parser.parse_args()
+
+    if not args.snapshot and not args.dump:
+        parser.error("one of --snapshot or --dump is required")
+
+    # Workers share the graph through a memory-mapped snapshot: each maps
+    # the same file read-only, so the pages are loaded once by the OS and
+    # nothing is pickled or copied per process.
+    snapshot, temporary = args.snapshot, None
+    if snapshot is None:
+        dag = load_family_tree(args.dump)
+        temporary = tempfile.NamedTemporaryFile(suffix=".snap", delete=False)
+        temporary.close()
+        dag.save(temporary.name)
+        snapshot = temporary.name
+        del dag
+
+    pairs_file = sys.stdin if args.pairs == "-" else open(args.pairs)
+    output = sys.stdout if args.output is None else open(args.output, "w", newline="")
+    start = time.perf_counter()
+    answered = 0
+    try:
+        write = _writer(output, args.format)
+        for results in run_batch(snapshot, read_pairs(pairs_file), args.processes, args.chunk_size):
+            for row in results:
+                write(row)
+            output.flush()
+            answered += len(results)
+    finally:
+        if pairs_file is not sys.stdin:
+            pairs_file.close()
+        if output is not sys.stdout:
+            output.close()
+        if temporary is not None:
+            os.remove(temporary.name)
+    print(f"Answered {answered} pairs in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+def read_pairs(lines):
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.replace(",", " ").split()
+        if len(fields) != 2:
+            print(f"Skipping malformed line: {line}", file=sys.stderr)
+            continue
+        yield fields[0], fields[1]
+
+def chunked(pairs, size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_batch(snapshot, pairs, processes=None, chunk_size=1000):
+    # Yields one list of result rows per chunk, in input order. Only a few
+    # chunks per worker are in flight at once, so pairs can be streamed
+    # from stdin and results written as they come. The answer is the
+    # nearest common ancestor, as from main.py --bidirectional.
+    chunks = chunked(pairs, chunk_size)
+    if processes == 1:
+        _load_graph(snapshot)
+        for chunk in chunks:
+            yield _answer(chunk)
+        return
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes, initializer=_load_graph, initargs=(snapshot,)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_answer, chunk))
+            if len(pending) >= 4 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _load_graph(snapshot):
+    global _tree
+    _tree = CSRFamilyTree.load(snapshot)
+
+def _answer(chunk):
+    rows = []
+    for individual1, individual2 in chunk:
+        lca = _find_lca(individual1, individual2)
+        rows.append({"individual1": individual1, "individual2": individual2, "lca": lca})
+    return rows
+
+def _find_lca(individual1, individual2):
+    index1, index2 = _tree.index_of(individual1), _tree.index_of(individual2)
+    if index1 is None or index2 is None:
+        return None
+    # Ties are broken on labels, not indices, to match the name-based search.
+    lca = find_lca_bidirectional(index1, index2, _NodeIndices(_tree), label=_tree.names.__getitem__)
+    return None if lca is None else _tree.names[lca]
+
+class _NodeIndices:
+    # Lets the search walk a CSRFamilyTree's profile parents by node index,
+    # so no label is decoded or looked up on the way up.
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __contains__(self, index):
+        return 0 <= index < self.tree.num_nodes
+
+    def get_parents(self, index):
+        return self.tree._profile_parents(index)
+
+def _writer(output, output_format):
+    if output_format == "jsonl":
+        return lambda row: output.write(json.dumps(row) + "\n")
+    writer = csv.DictWriter(output, fieldnames=["individual1", "individual2", "lca"])
+    writer.writeheader()
+    return lambda row: writer.writerow({**row, "lca": row["lca"] or ""})
+
+if __name__ == "__main__":
+    main()
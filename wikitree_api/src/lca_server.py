@@ -0,0 +1,54 @@
+import argparse
+from include.wikitree_api import WikiTreeAPI
+from include.family_tree_dag import FamilyTreeDAG
+from include.csr_family_tree import CSRFamilyTree
+from include.response_cache import ResponseCache
+from include.pedigree_loader import load_family_tree, print_progress
+from include.lca_service import LCAService, make_server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve LCA, ancestor and depth queries over HTTP")
+    parser.add_argument("individuals", nargs="*", help="WikiTree Names whose ancestries are loaded")
+    parser.add_argument("--dump", help="Load an archived pedigree dump instead of calling the API")
+    parser.add_argument("--snapshot", help="Map a snapshot written by --save-snapshot instead of building the graph")
+    parser.add_argument("--save-snapshot", help="Write the loaded graph to this snapshot file")
+    parser.add_argument("--lca-method", choices=("index", "bidirectional"),
+                        help="index: common ancestor closest to a root (smallest generation), indexed on the "
+                             "first /lca query; bidirectional: nearest common ancestor, no index "
+                             "(default with --snapshot, otherwise index)")
+    parser.add_argument("--dataset", help="Archived getAncestors responses, e.g. dataset/datos_validacion.json")
+    parser.add_argument("--cache", default="wikitree_cache.sqlite", help="SQLite file used to cache API responses")
+    parser.add_argument("--offline", action="store_true", help="Never touch the network, only use the cache and dataset")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.snapshot:
+        dag = CSRFamilyTree.load(args.snapshot)
+    elif args.dump:
+        dag = load_family_tree(args.dump, progress=print_progress)
+    else:
+        api = WikiTreeAPI(cache=ResponseCache(args.cache), offline=args.offline, dataset=args.dataset)
+        dag = FamilyTreeDAG()
+        for individual, result in api.fetch_many(args.individuals):
+            if result is None:
+                print(f"Could not fetch ancestors for {individual}")
+                continue
+            dag.add_ancestors(result[0][0]['ancestors'], individual)
+    if args.save_snapshot:
+        dag.save(args.save_snapshot)
+
+    method = args.lca_method or ("bidirectional" if args.snapshot else "index")
+    service = LCAService(dag, method)
+    nodes, edges = dag.graph_size()
+    server = make_server(service, args.host, args.port)
+    print(f"Serving {nodes} nodes and {edges} edges on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
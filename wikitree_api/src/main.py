@@ -1,32 +1,116 @@
 import argparse
-from include.wikitree_api import WikiTreeAPI
-from include.family_tree_dag import FamilyTreeDAG
+import subprocess
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("individual1", help="WikiTree Name of the first individual")
     parser.add_argument("individual2", help="WikiTree Name of the second individual")
+    parser.add_argument("--cache", default="wikitree_cache.sqlite", help="SQLite file used to cache API responses")
+    parser.add_argument("--no-cache", action="store_true", help="Always query the API")
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600, help="Seconds a cached response stays valid")
+    parser.add_argument("--offline", action="store_true", help="Never touch the network, only use the cache and dataset")
+    parser.add_argument("--dataset", help="Archived getAncestors responses, e.g. dataset/datos_validacion.json")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent API requests")
+    parser.add_argument("--rate-limit", type=float, help="Maximum API requests per second")
+    parser.add_argument("--crawl", action="store_true", help="Grow both ancestries a generation at a time until they meet")
+    parser.add_argument("--max-generations", type=int, default=30, help="How far back --crawl may go on each side")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="Search up from both individuals at once and stop where they meet (nearest common ancestor)")
+    parser.add_argument("--dump", help="Build the graph from an archived pedigree dump instead of the API")
+    parser.add_argument("--format", default="png", help="Tree image format: png, svg, pdf or dot")
+    parser.add_argument("--render-cache", default="render_cache", help="Directory of cached tree layouts")
+    parser.add_argument("--no-render", action="store_true", help="Skip drawing the trees")
+    parser.add_argument("--server", help="URL of a running lca_server to query instead of building the graph")
+    parser.add_argument("--render", action="store_true", help="With --server, also draw the trees")
+    parser.add_argument("--report", help="Write per-stage timings and counters to this JSON file")
+    parser.add_argument("--track-memory", action="store_true", help="Include peak memory per stage in --report")
+    parser.add_argument("--profile", help="Write a cProfile dump per stage into this directory")
     args = parser.parse_args()
 
-    api = WikiTreeAPI()
-    family_tree_data = api.fetch_family_tree_data(args.individual1, args.individual2)
+    if args.server:
+        query_server(args)
+    else:
+        run_locally(args)
+
+def query_server(args):
+    from include.lca_client import query
+
+    result = query(args.server, "lca", individual1=args.individual1, individual2=args.individual2)
+    if args.render:
+        from include.tree_renderer import render_dot
+
+        for number, individual in enumerate((args.individual1, args.individual2), 1):
+            source = query(args.server, "dot", node=individual)["dot"]
+            if source:
+                print("Visualizing tree for " + individual)
+                render_dot(source, f"tree{number}.{args.format}", args.render_cache)
+    report_lca(args, result["lca"])
+
+def run_locally(args):
+    # Imported here so that query_server does not pay for networkx.
+    from include.wikitree_api import WikiTreeAPI
+    from include.family_tree_dag import FamilyTreeDAG, ProfileParents, lowest_common_ancestor, find_lca_bidirectional
+    from include.response_cache import ResponseCache
+    from include.ancestry_crawler import AncestryCrawler
+    from include.pedigree_loader import load_family_tree, print_progress
+    from include.tree_renderer import render_many
+
+    from include.instrumentation import metrics
+
+    if args.report or args.profile:
+        metrics.enable(track_memory=args.track_memory, profile_dir=args.profile)
+
+    cache = None if args.no_cache else ResponseCache(args.cache, ttl=args.cache_ttl)
+    api = WikiTreeAPI(cache=cache, offline=args.offline, dataset=args.dataset,
+                      max_workers=args.workers, rate_limit=args.rate_limit)
+    meeting = []
+    if args.dump:
+        with metrics.stage("load"):
+            dag = load_family_tree(args.dump, progress=print_progress)
+    elif args.crawl:
+        with metrics.stage("crawl"):
+            crawler = AncestryCrawler(api, max_generations=args.max_generations)
+            dag, meeting = crawler.crawl(args.individual1, args.individual2)
+    else:
+        with metrics.stage("fetch"):
+            family_tree_data = api.fetch_family_tree_data(args.individual1, args.individual2)
+
+        if family_tree_data is None:
+            print("Could not fetch family tree data for one or both individuals.")
+            return
 
-    if family_tree_data is None:
-        print("Could not fetch family tree data for one or both individuals.")
-        return
+        with metrics.stage("build"):
+            dag = FamilyTreeDAG(family_tree_data[0], family_tree_data[1], args.individual1, args.individual2)
+    if not args.no_render:
+        jobs = []
+        for number, individual in enumerate((args.individual1, args.individual2), 1):
+            with metrics.stage("find_root"):
+                root = dag.find_root(individual)
+            if root:
+                print("Visualizing tree for " + individual)
+                jobs.append((individual, f"tree{number}.{args.format}"))
+        try:
+            with metrics.stage("render"):
+                render_many(dag, jobs, cache_dir=args.render_cache)
+        except (RuntimeError, OSError, subprocess.CalledProcessError) as err:
+            print(f"Could not render trees: {err}")
 
-    dag = FamilyTreeDAG(family_tree_data[0], family_tree_data[1], args.individual1, args.individual2)
-    root1 = dag.find_root(args.individual1)
-    root2 = dag.find_root(args.individual2)
-    if root1:
-        print("Visualizing tree for " + args.individual1)
-        dag.visualize_tree(root1, 'tree1.png')
-    if root2:
-        print("Visualizing tree for " + args.individual2)
-        dag.visualize_tree(root2, 'tree2.png')
+    with metrics.stage("query"):
+        if args.bidirectional:
+            # The merged graph links every ancestor straight to the
+            # individual, so generations are counted over profile parents.
+            lca = find_lca_bidirectional(args.individual1, args.individual2, ProfileParents(dag))
+        else:
+            lca = lowest_common_ancestor(args.individual1, args.individual2, dag)
+    if lca is None and meeting:
+        lca = meeting[0]
+    report_lca(args, lca)
 
-    lca = lowest_common_ancestor(args.individual1, args.individual2, dag)
+    if args.report:
+        metrics.write_report(args.report)
+        print(f"Instrumentation report written to {args.report}")
 
+def report_lca(args, lca):
     if lca:
         print(f"The most recent common ancestor of {args.individual1} and {args.individual2} is {lca}.")
     else:
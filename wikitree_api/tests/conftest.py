@@ -0,0 +1,46 @@
+import os
+import random
+
+from include.family_tree_dag import FamilyTreeDAG
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'dataset', 'datos_validacion.json')
+
+
+def profile(profile_id, father=0, mother=0, name=None):
+    return {'Id': profile_id, 'Name': name or f'P-{profile_id}', 'Father': father, 'Mother': mother}
+
+
+def build_dag(profiles, individuals):
+    # Every profile is handed in as an ancestor of every individual, the way
+    # main.py merges getAncestors responses.
+    dag = FamilyTreeDAG()
+    for individual in individuals:
+        dag.add_ancestors(profiles, individual)
+    return dag
+
+
+def random_pedigree(seed, size=40):
+    # Profiles in birth order, each with up to two parents among the
+    # earlier ones.
+    rng = random.Random(seed)
+    profiles = []
+    for profile_id in range(1, size + 1):
+        earlier = [other['Id'] for other in profiles]
+        father = rng.choice(earlier) if earlier and rng.random() < 0.8 else 0
+        mothers = [other for other in earlier if other != father]
+        mother = rng.choice(mothers) if mothers and rng.random() < 0.8 else 0
+        profiles.append(profile(profile_id, father, mother))
+    return profiles
+
+
+def ancestry(profiles, profile_id):
+    # A profile and all its ancestors, like a getAncestors response.
+    by_id = {p['Id']: p for p in profiles}
+    found = {}
+    stack = [profile_id]
+    while stack:
+        current = stack.pop()
+        if current and current not in found:
+            found[current] = by_id[current]
+            stack.extend((by_id[current]['Father'], by_id[current]['Mother']))
+    return list(found.values())
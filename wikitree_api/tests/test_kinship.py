@@ -0,0 +1,88 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from conftest import build_dag, profile, random_pedigree
+from include.csr_family_tree import CSRFamilyTree
+
+
+def brute_force_kinship(profiles):
+    parents = {p['Id']: (p['Father'], p['Mother']) for p in profiles}
+    memo = {}
+
+    def kinship(first, second):
+        if not first or not second:
+            return 0.0
+        if first < second:
+            first, second = second, first
+        if (first, second) not in memo:
+            father, mother = parents[first]
+            if first == second:
+                memo[first, second] = (1 + kinship(father, mother)) / 2
+            else:
+                memo[first, second] = (kinship(father, second) + kinship(mother, second)) / 2
+        return memo[first, second]
+    return kinship
+
+
+def brute_force_lca(profiles, first, second):
+    parents = {p['Id']: [parent for parent in (p['Father'], p['Mother']) if parent] for p in profiles}
+
+    def distances(start):
+        up = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for parent in parents[node]:
+                if parent not in up:
+                    up[parent] = up[node] + 1
+                    queue.append(parent)
+        return up
+    up1, up2 = distances(first), distances(second)
+    common = [(up1[node] + up2[node], f'P-{node}', node) for node in up1.keys() & up2.keys()]
+    if not common:
+        return None, -1
+    _, name, node = min(common)
+    return name, up1[node]
+
+
+def test_siblings_and_cousins():
+    profiles = [profile(1), profile(2), profile(3, 1, 2), profile(4, 1, 2), profile(5), profile(6),
+                profile(7, 3, 5), profile(8, 4, 6), profile(9, 3)]
+    individuals = ['P-3', 'P-4', 'P-7', 'P-8', 'P-9']
+    for tree in (build_dag(profiles, individuals), CSRFamilyTree.from_profiles(profiles)):
+        result = tree.relationship_matrix(individuals)
+        assert result.kinship[0, 1] == pytest.approx(0.25)
+        assert result.kinship[2, 3] == pytest.approx(0.0625)
+        assert result.kinship[2, 4] == pytest.approx(0.125)
+        assert result.kinship[0, 2] == pytest.approx(0.25)
+        assert result.lca[0, 1] == 'P-1'
+        assert result.cousin_degree[0, 1] == 0
+        assert result.cousin_degree[2, 3] == 1
+        assert result.lca[0, 2] == 'P-3'
+        assert result.cousin_degree[0, 2] == -1
+
+
+def test_inbred_diagonal():
+    profiles = [profile(1), profile(2), profile(3, 1, 2), profile(4, 1, 2), profile(5, 3, 4)]
+    result = CSRFamilyTree.from_profiles(profiles).relationship_matrix(['P-5'])
+    assert result.kinship[0, 0] == pytest.approx(0.625)
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_matches_brute_force(seed):
+    profiles = random_pedigree(seed)
+    individuals = [f'P-{profile_id}' for profile_id in range(25, 41)]
+    kinship = brute_force_kinship(profiles)
+    expected = np.array([[kinship(int(a[2:]), int(b[2:])) for b in individuals] for a in individuals])
+    dag = build_dag(profiles, individuals)
+    for tree in (dag, CSRFamilyTree.from_profiles(profiles), CSRFamilyTree.from_dag(dag)):
+        result = tree.relationship_matrix(individuals)
+        assert np.allclose(result.kinship, expected)
+        for i, first in enumerate(individuals):
+            for j, second in enumerate(individuals):
+                if i != j:
+                    lca, generations = brute_force_lca(profiles, int(first[2:]), int(second[2:]))
+                    assert result.lca[i, j] == lca
+                    assert result.generations[i, j] == generations
@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import ancestry, random_pedigree
+from include.csr_family_tree import CSRFamilyTree
+from include.family_tree_dag import FamilyTreeDAG, get_ancestors, lowest_common_ancestor
+from include.lca_index import LCAQueryEngine
+
+
+def merged_dag(profiles, individuals):
+    dag = FamilyTreeDAG()
+    for profile_id in individuals:
+        dag.add_ancestors(ancestry(profiles, profile_id), f'P-{profile_id}')
+    return dag
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_query_matches_lowest_common_ancestor(seed):
+    profiles = random_pedigree(seed)
+    individuals = list(range(31, 41))
+    names = [f'P-{profile_id}' for profile_id in individuals]
+    pairs = [(first, second) for first in names for second in names if first < second]
+    for dag in (merged_dag(profiles, individuals), CSRFamilyTree.from_profiles(profiles)):
+        engine = LCAQueryEngine(dag)
+        results = engine.query(pairs, all_minimal=True)
+        assert [lca for lca, _ in results] == engine.query(pairs)
+        for (first, second), (lca, minimal) in zip(pairs, results):
+            expected = lowest_common_ancestor(first, second, dag)
+            assert (lca is None) == (expected is None)
+            if lca is not None:
+                assert dag.generation(lca) == dag.generation(expected)
+            common = get_ancestors(first, dag) & get_ancestors(second, dag)
+            strict = {node: get_ancestors(node, dag) - {node} for node in common}
+            assert set(minimal) == {node for node in common
+                                    if not any(node in strict[other] for other in common)}
@@ -0,0 +1,22 @@
+import pytest
+
+from conftest import DATASET
+from include.pedigree_loader import GRAPH_FIELDS, iter_profiles
+from include.wikitree_api import load_dataset
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 20])
+def test_iter_profiles_matches_load_dataset(chunk_size):
+    # Small chunks cut strings and numbers at every possible place; a number
+    # split across two chunks must not be taken for a shorter one.
+    expected = []
+    documents = []
+    for data in load_dataset(DATASET).values():
+        if not any(data is document for document in documents):
+            documents.append(data)
+    for data in documents:
+        for entry in data:
+            for profile in entry['ancestors']:
+                expected.append((entry['user_name'], {field: profile.get(field) for field in GRAPH_FIELDS}))
+    assert expected
+    assert list(iter_profiles(DATASET, chunk_size=chunk_size)) == expected
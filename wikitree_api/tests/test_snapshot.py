@@ -0,0 +1,58 @@
+import random
+
+from conftest import ancestry, random_pedigree
+from include.csr_family_tree import CSRFamilyTree
+from include.family_tree_dag import FamilyTreeDAG, get_ancestors
+
+
+def partial_dag(seed):
+    # Only part of each ancestry is merged, so some children are still
+    # waiting for parent profiles.
+    rng = random.Random(seed)
+    profiles = random_pedigree(seed)
+    dag = FamilyTreeDAG()
+    for profile_id in range(31, 41):
+        ancestors = [p for p in ancestry(profiles, profile_id) if rng.random() < 0.6]
+        dag.add_ancestors(ancestors, f'P-{profile_id}')
+    return dag
+
+
+def test_dag_round_trip(tmp_path):
+    waiting = 0
+    for seed in range(10):
+        dag = partial_dag(seed)
+        path = str(tmp_path / f'{seed}.snap')
+        dag.save(path)
+        loaded = FamilyTreeDAG.load(path)
+        waiting += len(dag._waiting_children)
+        assert loaded._known_ids == dag._known_ids
+        assert loaded._parent_ids == dag._parent_ids
+        assert loaded.ancestors == dag.ancestors
+        assert loaded.profile_names == dag.profile_names
+        assert ({parent: sorted(children) for parent, children in loaded._waiting_children.items()}
+                == {parent: sorted(children) for parent, children in dag._waiting_children.items()})
+        assert set(loaded.graph.edges()) == set(dag.graph.edges())
+        assert loaded.graph_size() == dag.graph_size()
+        assert {node: loaded.generation(node) for node in loaded.graph} == {node: dag.generation(node) for node in dag.graph}
+    assert waiting
+
+
+def test_csr_load_lookups(tmp_path):
+    for seed in range(10):
+        dag = partial_dag(seed)
+        tree = CSRFamilyTree.from_dag(dag)
+        path = str(tmp_path / f'{seed}.snap')
+        dag.save(path)
+        loaded = CSRFamilyTree.load(path)
+        assert list(loaded.names) == tree.names
+        for index, name in enumerate(tree.names):
+            assert loaded.index_of(name) == index
+            assert loaded.get_parents(name) == tree.get_parents(name)
+            assert loaded.profile_parents(name) == dag.profile_parents(name)
+            assert set(get_ancestors(name, loaded)) == set(get_ancestors(name, dag))
+        for profile_id, name in dag.profile_names.items():
+            assert loaded.index_of(profile_id) == tree.index_of_name[name]
+            assert profile_id in loaded and name in loaded
+        assert loaded.index_of('Nobody-1') is None
+        assert loaded.index_of(10 ** 9) is None
+        assert 'Nobody-1' not in loaded
@@ -0,0 +1,99 @@
+import json
+
+from conftest import DATASET
+from include import response_cache
+from include.response_cache import ResponseCache
+from include.wikitree_api import WikiTreeAPI
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class StubSession:
+    # Stands in for requests.Session and records every request.
+    def __init__(self, data):
+        self.data = data
+        self.requests = []
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append(params)
+        return StubResponse(self.data)
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+        self.content = json.dumps(data).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_cache_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+    cache.put('getAncestors', 'Adams-1', 4, [{'ancestors': []}])
+    clock.now += 60
+    assert cache.get('getAncestors', 'Adams-1', 4) == [{'ancestors': []}]
+    clock.now += 1
+    assert cache.get('getAncestors', 'Adams-1', 4) is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=None, max_entries=2)
+    for key in ('a', 'b'):
+        clock.now += 1
+        cache.put('getAncestors', key, 4, key)
+    clock.now += 1
+    assert cache.get('getAncestors', 'a', 4) == 'a'
+    clock.now += 1
+    cache.put('getAncestors', 'c', 4, 'c')
+    assert len(cache) == 2
+    assert cache.get('getAncestors', 'b', 4) is None
+    assert cache.get('getAncestors', 'a', 4) == 'a'
+    assert cache.get('getAncestors', 'c', 4) == 'c'
+
+
+def test_offline_reads_dataset_and_cache_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('getAncestors', 'Cached-1', 4, [{'user_name': 'Cached-1', 'ancestors': []}])
+    api = WikiTreeAPI(cache=cache, offline=True, dataset=DATASET)
+    api.session = StubSession(None)
+
+    data, filename = api.fetch_ancestors('Adams-2240')
+    assert data[0]['user_name'] == 'Adams-2240'
+    assert any(profile['Name'] == 'Adams-2240' for profile in data[0]['ancestors'])
+    assert api.fetch_ancestors('Cached-1') == ([{'user_name': 'Cached-1', 'ancestors': []}], None)
+    assert api.fetch_ancestors('Nobody-1') is None
+    assert filename is None
+    assert api.session.requests == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['cache.sqlite']
+
+
+def test_network_fetch_is_cached_and_archived(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    response = [{'user_name': 'Stub-1', 'ancestors': [{'Id': 1, 'Name': 'Stub-1', 'Father': 0, 'Mother': 0}]}]
+    api = WikiTreeAPI(cache=ResponseCache(str(tmp_path / 'cache.sqlite')))
+    api.session = StubSession(response)
+
+    assert api.fetch_ancestors('Stub-1') == (response, 'ancestors_Stub-1.txt')
+    with open(tmp_path / 'ancestors_Stub-1.txt') as file:
+        assert json.load(file) == response
+    (tmp_path / 'ancestors_Stub-1.txt').unlink()
+    assert api.fetch_ancestors('Stub-1') == (response, None)
+    assert len(api.session.requests) == 1
+    assert not (tmp_path / 'ancestors_Stub-1.txt').exists()